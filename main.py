@@ -1,9 +1,22 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import whisper
+from starlette.background import BackgroundTask
+import orjson
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.audio import decode_audio
+import ctranslate2
+import numpy as np
+import asyncio
+import bisect
+import hashlib
 import tempfile
+import threading
 import os
+import sys
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional, List, Dict
 import logging
 import re
@@ -27,7 +40,13 @@ SPACY_AVAILABLE = False
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Audio Transcription API", version="1.0.0")
+app = FastAPI(
+    title="Audio Transcription API",
+    version="1.0.0",
+    # orjson serializes the large segment lists several times faster than
+    # the stdlib json encoder FastAPI uses by default
+    default_response_class=ORJSONResponse,
+)
 
 # Enable CORS for all origins
 # In production, you may want to restrict this to specific domains
@@ -43,22 +62,220 @@ app.add_middleware(
 
 # Global variables to store the loaded models
 whisper_model = None
+batched_pipeline = None
 diarization_pipeline = None
 nlp_model = None
 
-def load_whisper_model():
-    """Load the Whisper model on startup"""
-    global whisper_model
-    if whisper_model is None:
-        logger.info("Loading Whisper model...")
+# Batched pipelines keyed by model size. The default WHISPER_MODEL tier is
+# loaded eagerly at import; other tiers load lazily on first use and stay
+# resident for the process lifetime.
+model_pipelines: Dict[str, BatchedInferencePipeline] = {}
+
+# Guards lazy model loading so concurrent requests for the same (or any)
+# not-yet-loaded size construct exactly one WhisperModel between them
+_model_load_lock = threading.Lock()
+
+# How many 30 s chunks the batched pipeline decodes per forward pass
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+
+# Duration-based model tiering: a short upload can afford a larger, more
+# accurate model inside the same response-time budget that forces 'tiny'
+# on long calls. Off unless WHISPER_MODEL_SHORT names a different size,
+# e.g. WHISPER_MODEL_SHORT=base WHISPER_SHORT_MAX_SECONDS=120.
+SHORT_AUDIO_MODEL = os.getenv("WHISPER_MODEL_SHORT")
+SHORT_AUDIO_MAX_SECONDS = float(os.getenv("WHISPER_SHORT_MAX_SECONDS", "120"))
+
+# Sizes a client may request via the model query parameter
+ALLOWED_MODEL_SIZES = frozenset({"tiny", "base", "small", "medium"})
+
+# Bound how many transcriptions run at once. CTranslate2 already parallelizes
+# a single request across all CPU cores, so letting every concurrent upload
+# run inference simultaneously just thrashes the shared CPU - extra requests
+# queue on this semaphore instead.
+transcribe_semaphore = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_TRANSCRIPTIONS", "2")))
+
+# Content-addressed LRU cache of completed responses, keyed by the SHA-256 of
+# the upload plus the requested language. Re-uploads of the same file (client
+# retries, demo audio) skip the whole inference pipeline.
+transcription_cache: OrderedDict = OrderedDict()
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "32"))
+
+# Accepted upload extensions - built once instead of on every request
+ALLOWED_EXTENSIONS = frozenset({'.mp3', '.wav', '.m4a', '.flac', '.ogg', '.webm', '.mp4', '.mpeg'})
+UNSUPPORTED_TYPE_DETAIL = f"Unsupported file type. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+
+# All regex patterns are compiled once at import. The helpers below run them
+# per segment on every request, so recompiling (or even re-hashing into the
+# re module's internal cache) inside the loops is pure overhead.
+
+# Patterns that catch names mentioned in common phrases
+NAME_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    # Self-introduction patterns
+    r"(?:This is|I'm|I am|My name is|It's|It is|Call me)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
+    # Greeting patterns
+    r"(?:Hi|Hello|Hey),?\s+([A-Z][a-z]+)",
+    # Name-first patterns
+    r"([A-Z][a-z]+),?\s+(?:this is|I'm|I am|speaking|here)",
+    # Calling/asking for someone - improved pattern
+    r"(?:calling|speaking|looking|asking|to speak)\s+(?:for|with|to speak with|to speak for)?\s+([A-Z][a-z]+)",
+    # "looking to speak for [Name]" pattern
+    r"looking\s+to\s+speak\s+(?:for|with)\s+([A-Z][a-z]+)",
+    # Direct address
+    r"([A-Z][a-z]+),?\s+(?:you|your|yours)",
+    # "Thank you for holding, [Name]" pattern
+    r"(?:thank you for holding|holding for|putting through),?\s+([A-Z][a-z]+)",
+))
+
+# Strong self-introduction patterns (high confidence)
+SELF_INTRO_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"(?:This is|I'm|I am|My name is|It's|It is|Call me)\s+([A-Z][a-z]+)",
+    r"([A-Z][a-z]+),?\s+(?:this is|I'm|I am|speaking)",
+))
+
+# "Hi, Tania. This is Anthony" -> Anthony is the speaker
+GREETING_THEN_INTRO_RE = re.compile(
+    r"(?:Hi|Hello|Hey),?\s+([A-Z][a-z]+)[^.]*?(?:This is|I'm|I am)\s+([A-Z][a-z]+)",
+    re.IGNORECASE
+)
+GREETING_RE = re.compile(r"(?:Hi|Hello|Hey),?\s+([A-Z][a-z]+)", re.IGNORECASE)
+
+# Per-segment self-introduction check used when applying speaker names
+SEGMENT_INTRO_RE = re.compile(r"(?:This is|I'm|I am|My name is)\s+([A-Z][a-z]+)", re.IGNORECASE)
+
+# Key decisions / outcomes for the call summary
+DECISION_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"(?:we will|we'll|going to|will)\s+([^.]{10,100})",
+    r"(?:agreed|decided|confirmed)\s+(?:to|that|on)\s+([^.]{10,100})",
+    r"(?:action|next step|follow up).{0,50}(?:is|will be|to)\s+([^.]{10,100})",
+))
+
+# Action-item triggers folded into one alternation so each segment is scanned
+# once. Group names can't repeat, so each branch captures the action text in
+# its own group and ACTION_GROUP_KINDS maps the group back to the assignee type.
+ACTION_RE = re.compile(
+    # "I will [action]"
+    r"(?:I will|I'll|I'm going to|I need to|I should|I must)\s+(?P<self>[^.]{10,150})"
+    # "You will [action]" or "You need to [action]"
+    r"|(?:you will|you'll|you need to|you should|you must|please)\s+(?P<other>[^.]{10,150})"
+    # "We will [action]"
+    r"|(?:we will|we'll|we need to|we should|we must)\s+(?P<both>[^.]{10,150})"
+    # "Action: [description]"
+    r"|(?:action|task|todo|follow up|next step).{0,30}[:is]?\s+(?P<unknown>[^.]{10,150})"
+    # "Let me [action]"
+    r"|let me\s+(?P<self_let>[^.]{10,150})"
+    # "Can you [action]"
+    r"|can you\s+(?P<other_can>[^.]{10,150})",
+    re.IGNORECASE,
+)
+ACTION_GROUP_KINDS = {
+    "self": "self",
+    "other": "other",
+    "both": "both",
+    "unknown": "unknown",
+    "self_let": "self",
+    "other_can": "other",
+}
+
+# Date/time mentions attached to action items, likewise one alternation each;
+# the matched value is whichever capture group fired (match.lastindex)
+DATE_RE = re.compile(
+    r"(?:on|by|before|after|until)\s+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})"  # MM/DD/YYYY
+    r"|(?:on|by|before|after|until)\s+(\w+\s+\d{1,2},?\s+\d{4})"  # Month DD, YYYY
+    r"|(?:on|by|before|after|until)\s+(\w+\s+\d{1,2})"  # Month DD
+    r"|(?:on|by|before|after|until)\s+(today|tomorrow|next week|next month)"
+    r"|(?:end of|beginning of)\s+(\w+)",  # end of month, beginning of week
+    re.IGNORECASE,
+)
+
+TIME_RE = re.compile(
+    r"(?:at|by|before|after)\s+(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?)"
+    r"|(?:at|by|before|after)\s+(\d{1,2}\s*(?:AM|PM|am|pm))",
+    re.IGNORECASE,
+)
+
+# Main topics recognized by the call summary. The keywords are folded into a
+# single alternation with one named group per topic, so the transcript is
+# scanned in one pass instead of once per keyword.
+TOPIC_KEYWORDS = {
+    "order": ["order", "ordered", "ordering"],
+    "shipment": ["ship", "shipped", "shipping", "delivery", "deliver"],
+    "payment": ["payment", "pay", "paid", "cost", "price", "charge"],
+    "contract": ["contract", "agreement", "terms"],
+    "service": ["service", "support", "help", "assistance"],
+    "meeting": ["meeting", "call", "discuss", "talk"],
+}
+TOPIC_RE = re.compile(
+    "|".join(
+        f"(?P<{topic}>{'|'.join(map(re.escape, keywords))})"
+        for topic, keywords in TOPIC_KEYWORDS.items()
+    ),
+    re.IGNORECASE,
+)
+
+def load_whisper_model(model_size: Optional[str] = None) -> BatchedInferencePipeline:
+    """Load the Whisper model for a size tier, caching one pipeline per size"""
+    global whisper_model, batched_pipeline
+    if model_size is None:
         # Using 'tiny' model for faster production performance on Railway
         # Railway free tier has limited CPU, so smaller model = faster response
         # Options: 'tiny' (fastest), 'base' (balanced), 'small' (better accuracy)
         model_size = os.getenv("WHISPER_MODEL", "tiny")  # Default to 'tiny' for speed
-        whisper_model = whisper.load_model(model_size)
-        logger.info(f"Whisper model '{model_size}' loaded successfully")
-        logger.info("Whisper model loaded successfully")
-    return whisper_model
+    pipeline = model_pipelines.get(model_size)
+    if pipeline is not None:
+        return pipeline
+    # Serialize loading: concurrent requests for a not-yet-loaded size must
+    # not each construct their own WhisperModel - N simultaneous loads of a
+    # large tier would OOM the memory-capped instances this runs on
+    with _model_load_lock:
+        pipeline = model_pipelines.get(model_size)
+        if pipeline is not None:
+            return pipeline
+        logger.info(f"Loading Whisper model '{model_size}'...")
+        # faster-whisper runs the model through CTranslate2 with INT8 quantized
+        # weights - several times faster than the reference PyTorch implementation
+        # on the CPU-only instances we deploy to, at near-identical accuracy
+        # On GPU, int8 weights with FP16 activations use the tensor cores;
+        # on CPU, plain int8 is the fastest option. WHISPER_COMPUTE can
+        # override either default, e.g. 'float32' to disable quantization.
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        compute_type = os.getenv(
+            "WHISPER_COMPUTE",
+            "int8_float16" if device == "cuda" else "int8",
+        )
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            num_workers=1,
+            cpu_threads=os.cpu_count() or 4,
+        )
+        # The batched pipeline splits long audio at VAD boundaries and decodes
+        # several 30 s chunks per forward pass instead of strictly in sequence
+        pipeline = BatchedInferencePipeline(model=model)
+        model_pipelines[model_size] = pipeline
+        if whisper_model is None:
+            # First load is the default tier; the module globals keep pointing
+            # at it for the health check and warm-up
+            whisper_model = model
+            batched_pipeline = pipeline
+        logger.info(f"Whisper model '{model_size}' loaded successfully (device={device}, compute_type={compute_type})")
+    return pipeline
+
+def select_pipeline(duration_seconds: float, model_size: Optional[str] = None):
+    """
+    Pick the transcription pipeline for a request.
+
+    An explicit model_size (from the query parameter) wins; otherwise short
+    audio is upgraded to SHORT_AUDIO_MODEL when tiering is configured, and
+    everything else uses the default tier. Returns the pipeline together
+    with the resolved size so callers can report the tier actually used.
+    """
+    if not model_size:
+        if SHORT_AUDIO_MODEL and duration_seconds <= SHORT_AUDIO_MAX_SECONDS:
+            model_size = SHORT_AUDIO_MODEL
+        else:
+            model_size = os.getenv("WHISPER_MODEL", "tiny")
+    return load_whisper_model(model_size), model_size
 
 def load_diarization_pipeline():
     """Load the speaker diarization pipeline"""
@@ -112,24 +329,108 @@ def load_nlp_model():
             nlp_model = None
     return nlp_model
 
+def run_transcription(pipeline, audio, transcribe_options):
+    """
+    Run Whisper inference and materialize the segment generator.
+
+    Blocking - meant to be called through run_in_threadpool so the event
+    loop stays responsive while the model works.
+    """
+    segments_iter, info = pipeline.transcribe(
+        audio, batch_size=WHISPER_BATCH_SIZE, **transcribe_options
+    )
+    # Text is stripped once here; every later stage reuses the cleaned value
+    # instead of re-stripping. The duration falls out of the same pass as
+    # the last segment's end time.
+    segments = []
+    duration = 0.0
+    for seg in segments_iter:
+        segments.append({
+            "id": len(segments),
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text.strip(),
+        })
+        duration = seg.end
+    return segments, info, duration
+
+def run_diarization(audio):
+    """
+    Run speaker diarization on the decoded waveform.
+
+    Blocking - meant to be called through run_in_threadpool. Returns None
+    when the pipeline is unavailable or fails; callers fall back to the
+    gap-based speaker heuristic.
+    """
+    pipeline = load_diarization_pipeline()
+    if pipeline is None:
+        return None
+    try:
+        logger.info("Running speaker diarization...")
+        # Feed the already-decoded waveform instead of the temp file path,
+        # so pyannote doesn't re-read and re-decode the same audio from disk
+        diarization_input = {
+            "waveform": torch.from_numpy(audio).unsqueeze(0),
+            "sample_rate": 16000,
+        }
+        # inference_mode drops autograd tracking and version counters,
+        # saving memory and a few percent of runtime on every forward pass
+        with torch.inference_mode():
+            result = pipeline(diarization_input)
+        logger.info("Speaker diarization completed")
+        return result
+    except Exception as e:
+        logger.warning(f"Speaker diarization failed: {str(e)}. Continuing without speaker labels.")
+        return None
+
+def warm_up_whisper():
+    """Run one short transcription so the first real request is served warm"""
+    try:
+        # One second of silence is enough to page in the weights and
+        # initialize the compute kernels
+        silence = np.zeros(16000, dtype=np.float32)
+        segments_iter, _ = whisper_model.transcribe(silence, beam_size=1)
+        for _ in segments_iter:
+            pass
+        logger.info("Whisper warm-up transcription complete")
+    except Exception as e:
+        logger.warning(f"Whisper warm-up failed: {str(e)}")
+
 @app.on_event("startup")
 async def startup_event():
     """Load the models when the application starts"""
     load_whisper_model()
     load_diarization_pipeline()
     load_nlp_model()
+    warm_up_whisper()
+
+# Load the Whisper model at import time so it is ready before uvicorn starts
+# accepting traffic. Skipped when this file runs as a script (python main.py):
+# uvicorn.run("main:app") re-imports it as module 'main', which does the
+# preload in the process that actually serves - loading in the __main__
+# module too would leave a second, unused model copy resident.
+# Set SKIP_PRELOAD=1 when importing main.py from scripts/tests that don't
+# need the model. The startup hook's load call is then a no-op.
+if os.getenv("SKIP_PRELOAD") != "1" and __name__ != "__main__":
+    load_whisper_model()
 
-def extract_names_from_text(text: str) -> List[str]:
+@lru_cache(maxsize=128)
+def extract_names_from_text(text: str) -> frozenset:
     """
     Extract person names from text using NER or regex patterns
-    
+
+    Results are memoized on the text: each request calls this at least twice
+    with the full transcription (once from map_names_to_speakers, once from
+    the endpoint), and retried uploads repeat it again.
+
     Args:
         text: Text to extract names from
-    
+
     Returns:
-        List of unique names found
+        Set of unique names found. Consumers only do membership checks and
+        iteration, so there is no point sorting here; sort at display time
+        if a stable order is needed.
     """
-    import re
     names = set()
     
     # Common words to exclude
@@ -157,27 +458,9 @@ def extract_names_from_text(text: str) -> List[str]:
         except Exception as e:
             logger.warning(f"spaCy NER failed: {str(e)}")
     
-    # Also use regex patterns to catch names mentioned in common phrases
-    # More comprehensive patterns
-    patterns = [
-        # Self-introduction patterns
-        r"(?:This is|I'm|I am|My name is|It's|It is|Call me)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)",
-        # Greeting patterns
-        r"(?:Hi|Hello|Hey),?\s+([A-Z][a-z]+)",
-        # Name-first patterns
-        r"([A-Z][a-z]+),?\s+(?:this is|I'm|I am|speaking|here)",
-        # Calling/asking for someone - improved pattern
-        r"(?:calling|speaking|looking|asking|to speak)\s+(?:for|with|to speak with|to speak for)?\s+([A-Z][a-z]+)",
-        # "looking to speak for [Name]" pattern
-        r"looking\s+to\s+speak\s+(?:for|with)\s+([A-Z][a-z]+)",
-        # Direct address
-        r"([A-Z][a-z]+),?\s+(?:you|your|yours)",
-        # "Thank you for holding, [Name]" pattern
-        r"(?:thank you for holding|holding for|putting through),?\s+([A-Z][a-z]+)",
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    # Also use the precompiled patterns to catch names mentioned in common phrases
+    for pattern in NAME_PATTERNS:
+        matches = pattern.findall(text)
         for match in matches:
             if isinstance(match, tuple):
                 match = match[0] if match else ""
@@ -189,7 +472,7 @@ def extract_names_from_text(text: str) -> List[str]:
                 2 <= len(name.split()[0]) <= 20):
                 names.add(name)
     
-    return sorted(list(names))
+    return frozenset(names)
 
 def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict[str, str]:
     """
@@ -202,8 +485,6 @@ def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict
     Returns:
         Dictionary mapping speaker IDs to names (e.g., {"Speaker 1": "Anthony", "Speaker 2": "Gina"})
     """
-    import re
-    
     # Extract all names from transcription
     all_names = extract_names_from_text(transcription_text)
     
@@ -211,7 +492,7 @@ def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict
         logger.info("No names detected in transcription")
         return {}
     
-    logger.info(f"Detected names: {all_names}")
+    logger.info(f"Detected names: {sorted(all_names)}")
     
     # Create mapping: speaker_id -> name
     speaker_name_map = {}
@@ -219,25 +500,20 @@ def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict
     # Track which names have been assigned
     assigned_names = set()
     
-    # Strong self-introduction patterns (high confidence) - prioritize these
-    self_intro_patterns = [
-        r"(?:This is|I'm|I am|My name is|It's|It is|Call me)\s+([A-Z][a-z]+)",
-        r"([A-Z][a-z]+),?\s+(?:this is|I'm|I am|speaking)",
-    ]
-    
-    # Process segments in order to catch first introductions
+    # Process segments in order to catch first introductions.
+    # Segment text is stripped once at ingestion, so no re-strip per loop here.
     for seg in segments:
-        text = seg.get("text", "").strip()
+        text = seg.get("text")
         speaker = seg.get("speaker", "")
-        
+
         if not text or not speaker or speaker in speaker_name_map:
             continue
-        
+
         text_lower = text.lower()
         
         # First, check for strong self-introduction patterns (highest priority)
-        for pattern in self_intro_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in SELF_INTRO_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 if isinstance(match, tuple):
                     match = match[0] if match else ""
@@ -253,10 +529,7 @@ def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict
         if speaker not in speaker_name_map:
             # Check for "Hi, [Name]" followed by "This is [OtherName]" - the OtherName is the speaker
             # Pattern: "Hi, Tania. This is Anthony" -> Anthony is the speaker
-            greeting_followed_by_intro = re.search(
-                r"(?:Hi|Hello|Hey),?\s+([A-Z][a-z]+)[^.]*?(?:This is|I'm|I am)\s+([A-Z][a-z]+)",
-                text, re.IGNORECASE
-            )
+            greeting_followed_by_intro = GREETING_THEN_INTRO_RE.search(text)
             if greeting_followed_by_intro:
                 intro_name = greeting_followed_by_intro.group(2).strip()
                 if intro_name in all_names and intro_name not in assigned_names:
@@ -266,7 +539,7 @@ def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict
                     continue
             
             # Check for standalone "Hi, [Name]" - only if it's clearly self-intro
-            greeting_match = re.search(r"(?:Hi|Hello|Hey),?\s+([A-Z][a-z]+)", text, re.IGNORECASE)
+            greeting_match = GREETING_RE.search(text)
             if greeting_match:
                 name = greeting_match.group(1).strip()
                 if name in all_names and name not in assigned_names:
@@ -279,33 +552,38 @@ def map_names_to_speakers(segments: List[Dict], transcription_text: str) -> Dict
     # For remaining names, try to assign based on context
     # Look for patterns like "calling for [Name]", "looking for [Name]", "speaking with [Name]"
     # These usually refer to the other person
+    # Lowercase each segment's text once up front - the loop below would
+    # otherwise re-lower the same strings for every candidate name
+    lowered_segments = [(seg, seg.get("text", "").lower()) for seg in segments]
+
+    # Speaker set is the same for every name; build it once
+    all_speakers = {seg.get("speaker", "") for seg in segments if seg.get("speaker")}
+
     for name in all_names:
         if name in assigned_names:
             continue
-        
+
+        name_lower = name.lower()
+        # Phrases that suggest this is the person being called/asked for
+        calling_patterns = (
+            f"calling for {name_lower}",
+            f"looking for {name_lower}",
+            f"looking to speak for {name_lower}",
+            f"looking to speak with {name_lower}",
+            f"speaking with {name_lower}",
+            f"speak for {name_lower}",
+            f"speak with {name_lower}",
+        )
+
         # Find segments mentioning this name
-        for seg in segments:
-            text = seg.get("text", "").strip()
+        for seg, text_lower in lowered_segments:
             speaker = seg.get("speaker", "")
-            text_lower = text.lower()
-            
-            if name.lower() in text_lower and speaker not in speaker_name_map:
-                # Check for patterns that suggest this is the person being called/asked for
-                calling_patterns = [
-                    f"calling for {name.lower()}",
-                    f"looking for {name.lower()}",
-                    f"looking to speak for {name.lower()}",
-                    f"looking to speak with {name.lower()}",
-                    f"speaking with {name.lower()}",
-                    f"speak for {name.lower()}",
-                    f"speak with {name.lower()}",
-                ]
-                
+
+            if name_lower in text_lower and speaker not in speaker_name_map:
                 # If it's a calling pattern, assign to the OTHER speaker (not the one saying it)
                 if any(pattern in text_lower for pattern in calling_patterns):
                     # Find the other speaker
-                    all_speakers = set(seg.get("speaker", "") for seg in segments)
-                    other_speakers = [s for s in all_speakers if s != speaker and s]
+                    other_speakers = [s for s in all_speakers if s != speaker]
                     if other_speakers:
                         # Assign to the first other speaker found
                         other_speaker = other_speakers[0]
@@ -332,20 +610,13 @@ def generate_call_summary(transcription_text: str, segments_with_speakers: List[
     # Extract key information from the call
     summary_parts = []
     
-    # Identify main topics discussed
-    topics_keywords = {
-        "order": ["order", "ordered", "ordering"],
-        "shipment": ["ship", "shipped", "shipping", "delivery", "deliver"],
-        "payment": ["payment", "pay", "paid", "cost", "price", "charge"],
-        "contract": ["contract", "agreement", "terms"],
-        "service": ["service", "support", "help", "assistance"],
-        "meeting": ["meeting", "call", "discuss", "talk"],
-    }
-    
-    topics_mentioned = []
-    for topic, keywords in topics_keywords.items():
-        if any(keyword in transcription_text.lower() for keyword in keywords):
-            topics_mentioned.append(topic)
+    # Identify main topics discussed - one scan over the transcript
+    topics_found = set()
+    for match in TOPIC_RE.finditer(transcription_text):
+        topics_found.add(match.lastgroup)
+        if len(topics_found) == len(TOPIC_KEYWORDS):
+            break
+    topics_mentioned = [topic for topic in TOPIC_KEYWORDS if topic in topics_found]
     
     # Identify speakers
     speakers = set()
@@ -362,15 +633,9 @@ def generate_call_summary(transcription_text: str, segments_with_speakers: List[
         summary_parts.append(f"Topics discussed: {', '.join(topics_mentioned)}")
     
     # Extract key decisions or outcomes
-    decision_patterns = [
-        r"(?:we will|we'll|going to|will)\s+([^.]{10,100})",
-        r"(?:agreed|decided|confirmed)\s+(?:to|that|on)\s+([^.]{10,100})",
-        r"(?:action|next step|follow up).{0,50}(?:is|will be|to)\s+([^.]{10,100})",
-    ]
-    
     decisions = []
-    for pattern in decision_patterns:
-        matches = re.findall(pattern, transcription_text, re.IGNORECASE)
+    for pattern in DECISION_PATTERNS:
+        matches = pattern.findall(transcription_text)
         for match in matches:
             if isinstance(match, tuple):
                 match = match[0] if match else ""
@@ -395,6 +660,13 @@ def generate_call_summary(transcription_text: str, segments_with_speakers: List[
     
     return summary
 
+def _shingles(text: str) -> frozenset:
+    """5-word shingles of a lowercased description, for near-duplicate checks"""
+    tokens = text.lower().split()
+    if len(tokens) < 5:
+        return frozenset((" ".join(tokens),))
+    return frozenset(" ".join(tokens[i:i + 5]) for i in range(len(tokens) - 4))
+
 def extract_action_items(segments_with_speakers: List[Dict], transcription_text: str) -> List[Dict]:
     """
     Extract action items from the call with speaker, dates, and times
@@ -407,108 +679,82 @@ def extract_action_items(segments_with_speakers: List[Dict], transcription_text:
         List of action items with speaker, description, date, and time
     """
     action_items = []
-    
-    # Patterns for action items
-    action_patterns = [
-        # "I will [action]"
-        (r"(?:I will|I'll|I'm going to|I need to|I should|I must)\s+([^.]{10,150})", "self"),
-        # "You will [action]" or "You need to [action]"
-        (r"(?:you will|you'll|you need to|you should|you must|please)\s+([^.]{10,150})", "other"),
-        # "We will [action]"
-        (r"(?:we will|we'll|we need to|we should|we must)\s+([^.]{10,150})", "both"),
-        # "Action: [description]"
-        (r"(?:action|task|todo|follow up|next step).{0,30}[:is]?\s+([^.]{10,150})", "unknown"),
-        # "Let me [action]"
-        (r"let me\s+([^.]{10,150})", "self"),
-        # "Can you [action]"
-        (r"can you\s+([^.]{10,150})", "other"),
-    ]
-    
-    # Date/time patterns
-    date_patterns = [
-        r"(?:on|by|before|after|until)\s+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",  # MM/DD/YYYY
-        r"(?:on|by|before|after|until)\s+(\w+\s+\d{1,2},?\s+\d{4})",  # Month DD, YYYY
-        r"(?:on|by|before|after|until)\s+(\w+\s+\d{1,2})",  # Month DD
-        r"(?:on|by|before|after|until)\s+(today|tomorrow|next week|next month)",
-        r"(?:end of|beginning of)\s+(\w+)",  # end of month, beginning of week
-    ]
-    
-    time_patterns = [
-        r"(?:at|by|before|after)\s+(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?)",
-        r"(?:at|by|before|after)\s+(\d{1,2}\s*(?:AM|PM|am|pm))",
-    ]
-    
-    # Find action items in segments
+    # Shingle sets of accepted descriptions, parallel to action_items
+    seen_shingles = []
+
+    # Speaker set is the same for every match; build it once instead of per
+    # action item
+    all_speakers = {
+        seg.get("speaker", "") for seg in segments_with_speakers
+        if seg.get("speaker") and seg.get("speaker") != "Unknown"
+    }
+
+    # Find action items in segments (text is already stripped at ingestion)
     for seg in segments_with_speakers:
-        text = seg.get("text", "").strip()
+        text = seg.get("text")
         speaker = seg.get("speaker", "Unknown")
-        
+
         if not text:
             continue
-        
-        # Check for action patterns
-        for pattern, assignee_type in action_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = match[0] if match else ""
-                
-                action_text = match.strip()
-                if len(action_text) < 10 or len(action_text) > 200:
-                    continue
-                
-                # Extract date if mentioned
-                date_mentioned = None
-                for date_pattern in date_patterns:
-                    date_match = re.search(date_pattern, text, re.IGNORECASE)
-                    if date_match:
-                        date_mentioned = date_match.group(1) if date_match.groups() else date_match.group(0)
-                        break
-                
-                # Extract time if mentioned
-                time_mentioned = None
-                for time_pattern in time_patterns:
-                    time_match = re.search(time_pattern, text, re.IGNORECASE)
-                    if time_match:
-                        time_mentioned = time_match.group(1) if time_match.groups() else time_match.group(0)
-                        break
-                
-                # Determine assignee based on pattern type
-                assignee = speaker
-                if assignee_type == "other":
-                    # Find the other speaker
-                    all_speakers = set(seg.get("speaker", "") for seg in segments_with_speakers)
-                    other_speakers = [s for s in all_speakers if s != speaker and s and s != "Unknown"]
-                    if other_speakers:
-                        assignee = other_speakers[0]
-                elif assignee_type == "both":
-                    assignee = "Both"
-                
-                # Create action item
-                action_item = {
-                    "assignee": assignee,
-                    "description": action_text,
-                    "speaker": speaker,
-                    "timestamp": seg.get("start", 0),
-                }
-                
-                if date_mentioned:
-                    action_item["date"] = date_mentioned
-                if time_mentioned:
-                    action_item["time"] = time_mentioned
-                
-                # Avoid duplicates
-                is_duplicate = False
-                for existing in action_items:
-                    if (existing["description"].lower() == action_text.lower() or
-                        existing["description"].lower() in action_text.lower() or
-                        action_text.lower() in existing["description"].lower()):
-                        is_duplicate = True
-                        break
-                
-                if not is_duplicate:
-                    action_items.append(action_item)
-                    break  # Only take first match per segment
+
+        # Date/time only depend on the segment text, so look them up once
+        # per segment rather than once per action match
+        date_match = DATE_RE.search(text)
+        date_mentioned = date_match.group(date_match.lastindex) if date_match else None
+        time_match = TIME_RE.search(text)
+        time_mentioned = time_match.group(time_match.lastindex) if time_match else None
+
+        # One scan over the segment catches every trigger kind; keep at most
+        # one action item per regex branch per segment like the old
+        # per-pattern loop (two branches can share an assignee kind, e.g.
+        # "I will" and "let me" both map to "self", and each may still
+        # contribute its own item)
+        groups_added = set()
+        for action_match in ACTION_RE.finditer(text):
+            group_name = action_match.lastgroup
+            if group_name in groups_added:
+                continue
+            assignee_type = ACTION_GROUP_KINDS[group_name]
+
+            action_text = action_match.group(group_name).strip()
+            if len(action_text) < 10 or len(action_text) > 200:
+                continue
+
+            # Determine assignee based on pattern type
+            assignee = speaker
+            if assignee_type == "other":
+                # Find the other speaker
+                other_speakers = [s for s in all_speakers if s != speaker]
+                if other_speakers:
+                    assignee = other_speakers[0]
+            elif assignee_type == "both":
+                assignee = "Both"
+
+            # Create action item
+            action_item = {
+                "assignee": assignee,
+                "description": action_text,
+                "speaker": speaker,
+                "timestamp": seg.get("start", 0),
+            }
+
+            if date_mentioned:
+                action_item["date"] = date_mentioned
+            if time_mentioned:
+                action_item["time"] = time_mentioned
+
+            # Avoid near-duplicates: compare word shingles instead of the old
+            # pairwise substring-and-lower scans over every existing item
+            candidate = _shingles(action_text)
+            is_duplicate = any(
+                len(candidate & previous) / len(candidate | previous) > 0.6
+                for previous in seen_shingles
+            )
+
+            if not is_duplicate:
+                action_items.append(action_item)
+                seen_shingles.append(candidate)
+                groups_added.add(group_name)
     
     return action_items
 
@@ -533,65 +779,259 @@ def assign_speakers_to_segments(segments: List[Dict], diarization_result) -> Lis
         speaker_id = 0
         prev_end = 0
         gap_threshold = 1.0  # 1 second gap suggests speaker change
-        
+        labels = ("Speaker 1", "Speaker 2")  # shared, not rebuilt per segment
+
         for i, seg in enumerate(segments):
             seg_start = seg.get("start", 0)
             gap = seg_start - prev_end
-            
+
             # If there's a significant gap, likely a new speaker
             if gap > gap_threshold and i > 0:
                 speaker_id = (speaker_id + 1) % 2
-            
-            seg["speaker"] = f"Speaker {speaker_id + 1}"
+
+            seg["speaker"] = labels[speaker_id]
             prev_end = seg.get("end", 0)
         
         return segments
     
-    # Create a mapping of time ranges to speakers
-    speaker_segments = []
-    for turn, _, speaker in diarization_result.itertracks(yield_label=True):
-        speaker_segments.append({
-            "start": turn.start,
-            "end": turn.end,
-            "speaker": speaker
-        })
-    
-    # Assign speakers to transcription segments based on time overlap
+    # Create a time-sorted mapping of diarization turns to speakers. Both
+    # this list and the transcription segments are ordered by time, so each
+    # segment can be matched with a binary search instead of a linear scan.
+    speaker_segments = [
+        {"start": turn.start, "end": turn.end, "speaker": speaker}
+        for turn, _, speaker in diarization_result.itertracks(yield_label=True)
+    ]
+    speaker_segments.sort(key=lambda s: s["start"])
+    turn_starts = [s["start"] for s in speaker_segments]
+
+    # Cache of raw diarization labels to display labels (SPEAKER_00 -> Speaker 1)
+    label_map = {}
+
     for seg in segments:
         seg_start = seg.get("start", 0)
         seg_end = seg.get("end", 0)
         seg_mid = (seg_start + seg_end) / 2
-        
-        # Find the speaker segment that contains the midpoint of this transcription segment
+
+        # Find the last turn starting at or before the segment midpoint
         assigned_speaker = None
-        for spk_seg in speaker_segments:
-            if spk_seg["start"] <= seg_mid <= spk_seg["end"]:
-                assigned_speaker = spk_seg["speaker"]
-                break
-        
-        # If no exact match, find the closest speaker segment
+        idx = bisect.bisect_right(turn_starts, seg_mid) - 1
+        if idx >= 0 and speaker_segments[idx]["end"] >= seg_mid:
+            assigned_speaker = speaker_segments[idx]["speaker"]
+
+        # No turn contains the midpoint - take whichever neighboring turn
+        # overlaps the segment the most
         if assigned_speaker is None:
-            min_distance = float('inf')
-            for spk_seg in speaker_segments:
-                # Calculate overlap
-                overlap_start = max(seg_start, spk_seg["start"])
-                overlap_end = min(seg_end, spk_seg["end"])
-                if overlap_start < overlap_end:
-                    overlap = overlap_end - overlap_start
-                    if overlap > min_distance:
-                        min_distance = overlap
+            best_overlap = 0.0
+            for j in (idx, idx + 1):
+                if 0 <= j < len(speaker_segments):
+                    spk_seg = speaker_segments[j]
+                    overlap = min(seg_end, spk_seg["end"]) - max(seg_start, spk_seg["start"])
+                    if overlap > best_overlap:
+                        best_overlap = overlap
                         assigned_speaker = spk_seg["speaker"]
-        
+
         # Default to Speaker 1 if no match found
         if assigned_speaker is None:
             assigned_speaker = "SPEAKER_00"
-        
+
         # Convert speaker ID to readable format (SPEAKER_00 -> Speaker 1)
-        speaker_num = int(assigned_speaker.split("_")[-1]) + 1
-        seg["speaker"] = f"Speaker {speaker_num}"
-    
+        label = label_map.get(assigned_speaker)
+        if label is None:
+            # Interned so every segment (and every request) shares one str
+            # object per label instead of a fresh "Speaker N" allocation
+            label = sys.intern(f"Speaker {int(assigned_speaker.split('_')[-1]) + 1}")
+            label_map[assigned_speaker] = label
+        seg["speaker"] = label
+
     return segments
 
+def enrich_segments(segments: List[Dict], transcription_text: str, diarization_result) -> List[Dict]:
+    """
+    Assign speaker labels to segments and swap in detected names.
+
+    Combines diarization-based speaker assignment, name-to-speaker mapping,
+    and per-segment self-introduction overrides. Mutates and returns the
+    segment list.
+    """
+    segments_with_speakers = assign_speakers_to_segments(segments, diarization_result)
+
+    # Extract names and map them to speakers
+    speaker_name_map = map_names_to_speakers(segments_with_speakers, transcription_text)
+    all_names = extract_names_from_text(transcription_text)
+
+    # Replace speaker labels with actual names where available
+    # Also check each segment individually for "This is [Name]" patterns
+    for seg in segments_with_speakers:
+        speaker_id = seg.get("speaker", "")
+        text = seg["text"]
+
+        # Check if this segment contains a self-introduction
+        # Pattern: "This is [Name]" or "I'm [Name]" - this speaker IS that name
+        intro_match = SEGMENT_INTRO_RE.search(text)
+        if intro_match:
+            name = intro_match.group(1).strip()
+            # If this name is in our detected names, assign it to this speaker
+            if name in all_names:
+                # Update the speaker name map for this speaker ID
+                speaker_name_map[speaker_id] = name
+                seg["speaker"] = name
+                logger.info(f"Segment-level mapping: {speaker_id} -> {name} (from '{text[:50]}...')")
+                continue
+
+        # Otherwise, use the mapped name if available
+        if speaker_id in speaker_name_map:
+            seg["speaker"] = speaker_name_map[speaker_id]
+
+    return segments_with_speakers
+
+async def build_summary_and_actions(transcription_text: str, segments_with_speakers: List[Dict]):
+    """
+    Generate the call summary and action items concurrently on worker
+    threads. The two are independent of each other, so running them in
+    parallel halves this phase; each is guarded so a failure degrades the
+    response instead of failing the request.
+    """
+    def _summary() -> str:
+        try:
+            logger.info("Generating call summary...")
+            call_summary = generate_call_summary(transcription_text, segments_with_speakers)
+            logger.info(f"Summary generated: {len(call_summary)} chars")
+            return call_summary
+        except Exception as e:
+            logger.error(f"Error generating summary: {str(e)}", exc_info=True)
+            return f"Error generating summary: {str(e)}"
+
+    def _actions() -> List[Dict]:
+        try:
+            logger.info("Extracting action items...")
+            action_items = extract_action_items(segments_with_speakers, transcription_text)
+            logger.info(f"Action items extracted: {len(action_items)}")
+            return action_items
+        except Exception as e:
+            logger.error(f"Error extracting action items: {str(e)}", exc_info=True)
+            return []
+
+    return await asyncio.gather(
+        run_in_threadpool(_summary),
+        run_in_threadpool(_actions),
+    )
+
+def assemble_response(segments_with_speakers: List[Dict], transcription_text: str,
+                      detected_language: str, language: Optional[str],
+                      call_summary: str, action_items: List[Dict],
+                      filename: str, file_size: int, duration: float,
+                      diarized: bool, include_segments: bool) -> Dict:
+    """Build the /transcribe response payload"""
+    # One pass over the segments collects the speaker set and, when the
+    # client wants them, the speaker-labelled transcript entries
+    speakers = set()
+    transcription_with_speakers = [] if include_segments else None
+    for seg in segments_with_speakers:
+        speaker = seg.get("speaker", "Unknown")
+        speakers.add(speaker)
+        if transcription_with_speakers is not None:
+            transcription_with_speakers.append({
+                "speaker": speaker,
+                "text": seg["text"],
+                "start": seg.get("start"),
+                "end": seg.get("end")
+            })
+
+    response = {
+        "success": True,
+        "transcription": transcription_text,
+        "summary": call_summary,
+        "action_items": action_items,
+        "language_detected": detected_language,
+        "language_requested": language if language else "auto",
+        "metadata": {
+            "filename": filename,
+            "file_size": file_size,
+            "duration": duration,
+            "speaker_diarization": diarized,
+            "total_speakers": len(speakers),
+            "total_action_items": len(action_items)
+        }
+    }
+
+    if include_segments:
+        response["transcription_with_speakers"] = transcription_with_speakers
+        # The segment dicts already carry exactly the response fields
+        # (id/start/end/text plus the speaker label), so ship them as-is
+        # instead of rebuilding thousands of identical dicts
+        response["segments"] = segments_with_speakers
+
+    return response
+
+def _cleanup_temp_file(path: str):
+    """Delete the request's temp file; used as a post-response background task"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def stream_transcription(pipeline, audio, transcribe_options: Dict, language: Optional[str],
+                               filename: str, file_size: int, include_segments: bool):
+    """
+    NDJSON event stream for /transcribe?stream=true.
+
+    Emits one {"type": "segment"} line per transcribed segment as the model
+    produces it, then a final {"type": "result"} line carrying the same
+    payload the non-streaming endpoint returns. Clients see the first words
+    after one chunk instead of waiting for the whole pipeline.
+    """
+    try:
+        async with transcribe_semaphore:
+            # Diarization runs concurrently while segments stream out
+            diarization_task = asyncio.ensure_future(run_in_threadpool(run_diarization, audio))
+
+            segments_iter, info = await run_in_threadpool(
+                lambda: pipeline.transcribe(
+                    audio, batch_size=WHISPER_BATCH_SIZE, **transcribe_options
+                )
+            )
+
+            segments = []
+            duration = 0.0
+            iterator = iter(segments_iter)
+            while True:
+                # Each next() call decodes on a worker thread; the loop stays free
+                seg = await run_in_threadpool(next, iterator, None)
+                if seg is None:
+                    break
+                seg_dict = {
+                    "id": len(segments),
+                    "start": seg.start,
+                    "end": seg.end,
+                    "text": seg.text.strip(),
+                }
+                segments.append(seg_dict)
+                duration = seg.end
+                yield orjson.dumps({"type": "segment", "data": seg_dict}) + b"\n"
+
+            diarization_result = await diarization_task
+
+        detected_language = info.language if info else "unknown"
+        transcription_text = " ".join(seg["text"] for seg in segments if seg["text"])
+
+        segments_with_speakers = await run_in_threadpool(
+            enrich_segments, segments, transcription_text, diarization_result
+        )
+        call_summary, action_items = await build_summary_and_actions(
+            transcription_text, segments_with_speakers
+        )
+
+        response = assemble_response(
+            segments_with_speakers, transcription_text, detected_language, language,
+            call_summary, action_items, filename, file_size, duration,
+            diarization_result is not None, include_segments
+        )
+        yield orjson.dumps({"type": "result", "data": response}) + b"\n"
+
+    except Exception as e:
+        logger.error(f"Error during streamed transcription: {str(e)}", exc_info=True)
+        yield orjson.dumps({"type": "error", "detail": f"Transcription failed: {str(e)}"}) + b"\n"
+
 @app.get("/")
 async def root():
     return {
@@ -611,7 +1051,7 @@ async def health_check():
 @app.options("/transcribe")
 async def transcribe_options():
     """Handle CORS preflight requests"""
-    return JSONResponse(
+    return ORJSONResponse(
         content={},
         headers={
             "Access-Control-Allow-Origin": "*",
@@ -624,16 +1064,36 @@ async def transcribe_options():
 @app.post("/transcribe")
 async def transcribe_audio(
     file: UploadFile = File(...),
-    language: Optional[str] = None
+    language: Optional[str] = None,
+    include_segments: bool = True,
+    robust: bool = False,
+    stream: bool = False,
+    model: Optional[str] = None
 ):
     """
     Transcribe an audio file using Whisper model.
-    
+
     Args:
         file: Audio file to transcribe (supports: mp3, wav, m4a, flac, etc.)
         language: Optional language code ('en' for English, 'es' for Spanish).
                  If not provided, Whisper will auto-detect the language.
-    
+        include_segments: Set to false to omit the per-segment lists from the
+                 response, which keeps the payload small for clients that
+                 only want the transcription, summary and action items.
+        robust: Set to true to re-enable Whisper's temperature-fallback
+                 decoding for noisy audio. More accurate on hard files but
+                 can re-run the decoder up to 5x on difficult segments;
+                 the default greedy pass is much faster.
+        stream: Set to true to receive newline-delimited JSON instead of a
+                 single response: one {"type": "segment"} line per segment
+                 as it is transcribed, followed by a final {"type": "result"}
+                 line with the full payload. Streamed responses bypass the
+                 cache.
+        model: Optional Whisper size ('tiny', 'base', 'small', 'medium') to
+                 use for this request, overriding the default tier and the
+                 duration-based selection. Larger sizes are slower; the
+                 first request for a new size also pays its load time.
+
     Returns:
         JSON response with transcription, language detected, and metadata
     """
@@ -641,14 +1101,10 @@ async def transcribe_audio(
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     # Validate file type
-    allowed_extensions = {'.mp3', '.wav', '.m4a', '.flac', '.ogg', '.webm', '.mp4', '.mpeg'}
     file_extension = os.path.splitext(file.filename)[1].lower()
-    
-    if file_extension not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type. Allowed types: {', '.join(allowed_extensions)}"
-        )
+
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_TYPE_DETAIL)
     
     # Validate language if provided
     if language and language not in ['en', 'es']:
@@ -656,158 +1112,145 @@ async def transcribe_audio(
             status_code=400,
             detail="Language must be 'en' (English) or 'es' (Spanish), or omit for auto-detection"
         )
+
+    # Validate model size if provided
+    if model and model not in ALLOWED_MODEL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model must be one of {sorted(ALLOWED_MODEL_SIZES)}, or omit for automatic selection"
+        )
     
     try:
-        # Save uploaded file temporarily
+        # Save uploaded file temporarily, streaming in 1 MiB chunks so the
+        # whole upload is never buffered in memory. The content hash is
+        # computed on the same pass for the response cache.
+        file_size = 0
+        hasher = hashlib.sha256()
         with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
+            while chunk := await file.read(1 << 20):
+                temp_file.write(chunk)
+                hasher.update(chunk)
+                file_size += len(chunk)
             temp_file_path = temp_file.name
+        cache_key = f"{hasher.hexdigest()}:{language or 'auto'}:{int(include_segments)}:{int(robust)}:{model or 'auto'}"
         
         try:
+            # Return the cached response for a repeated upload before touching
+            # the model at all. Streamed requests bypass the cache: the
+            # client expects NDJSON events, not the stored JSON document.
+            cached = None if stream else transcription_cache.get(cache_key)
+            if cached is not None:
+                transcription_cache.move_to_end(cache_key)
+                logger.info(f"Returning cached transcription for {file.filename}")
+                # The hit may come from the same bytes uploaded under another
+                # name; report the current filename, copying rather than
+                # mutating the stored response
+                if cached["metadata"]["filename"] != file.filename:
+                    cached = {**cached, "metadata": {**cached["metadata"], "filename": file.filename}}
+                return ORJSONResponse(
+                    content=cached,
+                    background=BackgroundTask(_cleanup_temp_file, temp_file_path)
+                )
+
             # Transcribe audio
             logger.info(f"Transcribing audio file: {file.filename}")
-            
+
+            # Decode the upload once to 16 kHz mono float32. Passing the array
+            # to transcribe() saves a second ffmpeg pass over the temp file,
+            # and the buffer can be reused by later pipeline stages.
+            audio = await run_in_threadpool(decode_audio, temp_file_path, sampling_rate=16000)
+
+            # Pick the model tier from the decoded duration (samples / 16 kHz);
+            # the first request for a not-yet-loaded size pays its load time
+            # on a worker thread rather than blocking the event loop
+            pipeline, model_size = await run_in_threadpool(select_pipeline, len(audio) / 16000.0, model)
+
             # Prepare transcription options
+            # beam_size=1 (greedy) and the built-in VAD filter keep latency low;
+            # language=None lets the model auto-detect. A single temperature
+            # with no conditioning on previous text avoids the up-to-5x
+            # decoder fallback loop unless the caller opted into robust mode.
             transcribe_options = {
                 "task": "transcribe",
-                "verbose": False
+                "beam_size": 1,
+                "vad_filter": True,
+                # Collapse pauses longer than half a second so the encoder
+                # never sees silent windows - call recordings are often
+                # 30-60% hold time and silence
+                "vad_parameters": {"min_silence_duration_ms": 500},
+                "language": language if language else None,
+                "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0) if robust else 0.0,
+                "condition_on_previous_text": robust,
             }
-            
-            # Set language if specified, otherwise auto-detect
-            if language:
-                transcribe_options["language"] = language
-            else:
-                # Auto-detect language (Whisper will detect automatically)
-                transcribe_options["language"] = None
-            
+
+            if stream:
+                # The generator only needs the decoded audio array, so the
+                # temp file can be deleted by the background task as soon as
+                # the stream finishes
+                logger.info(f"Streaming transcription for {file.filename}")
+                return StreamingResponse(
+                    stream_transcription(
+                        pipeline, audio, transcribe_options, language,
+                        file.filename, file_size, include_segments
+                    ),
+                    media_type="application/x-ndjson",
+                    background=BackgroundTask(_cleanup_temp_file, temp_file_path)
+                )
+
             # Perform transcription with error handling
-            logger.info(f"Starting transcription with model: {os.getenv('WHISPER_MODEL', 'tiny')}")
+            logger.info(f"Starting transcription with model: {model_size}")
             try:
-                result = whisper_model.transcribe(temp_file_path, **transcribe_options)
+                async with transcribe_semaphore:
+                    # Transcription and diarization are independent until the
+                    # speaker-assignment merge, so run them concurrently on
+                    # worker threads; the event loop stays responsive either way
+                    (segments, info, duration), diarization_result = await asyncio.gather(
+                        run_in_threadpool(run_transcription, pipeline, audio, transcribe_options),
+                        run_in_threadpool(run_diarization, audio),
+                    )
                 logger.info("Transcription completed successfully")
             except Exception as transcribe_error:
                 logger.error(f"Transcription error: {str(transcribe_error)}", exc_info=True)
                 raise HTTPException(
-                    status_code=500, 
+                    status_code=500,
                     detail=f"Transcription failed: {str(transcribe_error)}"
                 )
-            
+
             # Extract results
-            detected_language = result.get("language", "unknown")
-            transcription_text = result.get("text", "").strip()
-            segments = result.get("segments", [])
-            
-            # Perform speaker diarization
-            diarization_result = None
-            try:
-                pipeline = load_diarization_pipeline()
-                if pipeline is not None:
-                    logger.info("Running speaker diarization...")
-                    diarization_result = pipeline(temp_file_path)
-                    logger.info("Speaker diarization completed")
-            except Exception as e:
-                logger.warning(f"Speaker diarization failed: {str(e)}. Continuing without speaker labels.")
-            
-            # Assign speakers to segments
-            segments_with_speakers = assign_speakers_to_segments(segments, diarization_result)
-            
-            # Extract names and map them to speakers
-            speaker_name_map = map_names_to_speakers(segments_with_speakers, transcription_text)
-            all_names = extract_names_from_text(transcription_text)
-            
-            # Replace speaker labels with actual names where available
-            # Also check each segment individually for "This is [Name]" patterns
-            import re
-            for seg in segments_with_speakers:
-                speaker_id = seg.get("speaker", "")
-                text = seg.get("text", "").strip()
-                
-                # Check if this segment contains a self-introduction
-                # Pattern: "This is [Name]" or "I'm [Name]" - this speaker IS that name
-                intro_match = re.search(r"(?:This is|I'm|I am|My name is)\s+([A-Z][a-z]+)", text, re.IGNORECASE)
-                if intro_match:
-                    name = intro_match.group(1).strip()
-                    # If this name is in our detected names, assign it to this speaker
-                    if name in all_names:
-                        # Update the speaker name map for this speaker ID
-                        speaker_name_map[speaker_id] = name
-                        seg["speaker"] = name
-                        logger.info(f"Segment-level mapping: {speaker_id} -> {name} (from '{text[:50]}...')")
-                        continue
-                
-                # Otherwise, use the mapped name if available
-                if speaker_id in speaker_name_map:
-                    seg["speaker"] = speaker_name_map[speaker_id]
-            
-            # Build transcription with speaker labels
-            transcription_with_speakers = []
-            for seg in segments_with_speakers:
-                transcription_with_speakers.append({
-                    "speaker": seg.get("speaker", "Unknown"),
-                    "text": seg.get("text", "").strip(),
-                    "start": seg.get("start"),
-                    "end": seg.get("end")
-                })
-            
-            # Generate call summary
-            call_summary = ""
-            try:
-                logger.info("Generating call summary...")
-                call_summary = generate_call_summary(transcription_text, segments_with_speakers)
-                logger.info(f"Summary generated: {len(call_summary)} chars")
-            except Exception as e:
-                logger.error(f"Error generating summary: {str(e)}", exc_info=True)
-                call_summary = f"Error generating summary: {str(e)}"
-            
-            # Extract action items
-            action_items = []
-            try:
-                logger.info("Extracting action items...")
-                action_items = extract_action_items(segments_with_speakers, transcription_text)
-                logger.info(f"Action items extracted: {len(action_items)}")
-            except Exception as e:
-                logger.error(f"Error extracting action items: {str(e)}", exc_info=True)
-                action_items = []
-            
-            # Prepare response
-            response = {
-                "success": True,
-                "transcription": transcription_text,
-                "summary": call_summary,
-                "action_items": action_items,
-                "language_detected": detected_language,
-                "language_requested": language if language else "auto",
-                "transcription_with_speakers": transcription_with_speakers,
-                "segments": [
-                    {
-                        "id": seg.get("id"),
-                        "speaker": seg.get("speaker", "Unknown"),
-                        "start": seg.get("start"),
-                        "end": seg.get("end"),
-                        "text": seg.get("text", "").strip()
-                    }
-                    for seg in segments_with_speakers
-                ],
-                "metadata": {
-                    "filename": file.filename,
-                    "file_size": len(content),
-                    "duration": segments[-1].get("end", 0) if segments else 0,
-                    "speaker_diarization": diarization_result is not None,
-                    "total_speakers": len(set(seg.get("speaker", "") for seg in segments_with_speakers)),
-                    "total_action_items": len(action_items)
-                }
-            }
+            detected_language = info.language if info else "unknown"
+            transcription_text = " ".join(seg["text"] for seg in segments if seg["text"])
             
+            # Assign speakers, map detected names onto them, then build the
+            # summary/action items and the response payload
+            segments_with_speakers = enrich_segments(segments, transcription_text, diarization_result)
+            call_summary, action_items = await build_summary_and_actions(transcription_text, segments_with_speakers)
+
+            response = assemble_response(
+                segments_with_speakers, transcription_text, detected_language, language,
+                call_summary, action_items, file.filename, file_size, duration,
+                diarization_result is not None, include_segments
+            )
+
             logger.info(f"Transcription completed. Language: {detected_language}, Length: {len(transcription_text)} chars")
-            
-            return JSONResponse(content=response)
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
+
+            # Only successful responses are cached
+            transcription_cache[cache_key] = response
+            if len(transcription_cache) > TRANSCRIPTION_CACHE_SIZE:
+                transcription_cache.popitem(last=False)
+
+            # Deleting the temp file after the response has gone out keeps
+            # the unlink syscall off the request's critical path
+            return ORJSONResponse(
+                content=response,
+                background=BackgroundTask(_cleanup_temp_file, temp_file_path)
+            )
+
+        except BaseException:
+            # Successful returns above clean up via their background task;
+            # on any error delete the temp file before propagating
+            _cleanup_temp_file(temp_file_path)
+            raise
+
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
@@ -815,11 +1258,16 @@ async def transcribe_audio(
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    # Configure uvicorn with longer timeouts for transcription processing
+    # Configure uvicorn with longer timeouts for transcription processing.
+    # WEB_CONCURRENCY > 1 spawns multiple workers, and each one re-imports
+    # this module and loads its own full model copy - uvicorn uses the spawn
+    # context, so nothing is forked or shared. Budget a full model's RSS per
+    # worker before raising this on memory-capped instances.
     uvicorn.run(
-        app, 
-        host="0.0.0.0", 
+        "main:app",
+        host="0.0.0.0",
         port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
         timeout_keep_alive=600,  # Keep connections alive for 10 minutes
         timeout_graceful_shutdown=30
     )
@@ -3,6 +3,7 @@
 import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault("SKIP_PRELOAD", "1")  # don't load the model for this test
 
 from main import extract_names_from_text, map_names_to_speakers
 
@@ -21,7 +22,7 @@ segments = [
 
 print("Testing name extraction...")
 names = extract_names_from_text(test_text)
-print(f"Names found: {names}")
+print(f"Names found: {sorted(names)}")
 
 print("\nTesting name mapping...")
 name_map = map_names_to_speakers(segments, test_text)